@@ -1,15 +1,30 @@
-import requests
+import asyncio
 import json
 
-def get_ip_info():
-    try:
-        # Get IP details from ipapi.co
-        response = requests.get("https://ipapi.co/json/")
-        data = response.json()
+import aiohttp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+API_URL = "https://ipapi.co/json/"
+USER_AGENT = "ip-checker/1"
+_VERSION = {True: "IPv6", False: "IPv4"}
+
+
+async def fetch_once():
+    """Get IP details from ipapi.co (a single request shared by every consumer)"""
+    async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}) as session:
+        async with session.get(API_URL) as response:
+            return await response.json()
+
 
+def get_ip_info(data):
+    try:
         # Extract important fields
         ip = data.get("ip")
-        version = "IPv6" if ":" in ip else "IPv4"
+        version = _VERSION[ip is not None and ":" in ip]
         city = data.get("city")
         region = data.get("region")
         country = data.get("country_name")
@@ -31,17 +46,19 @@ def get_ip_info():
         print("===================================================\n")
 
     except Exception as e:
-        print("❌ Error fetching IP details:", e)
+        print("❌ Error displaying IP details:", e)
 
 
-def save_to_file():
+def save_to_file(data):
     """Optional: Save the details to a JSON file for logs"""
     try:
-        response = requests.get("https://ipapi.co/json/")
-        data = response.json()
-
-        with open("ip_info.json", "w") as f:
-            json.dump(data, f, indent=4)
+        # encode in one go and hand the file a single buffer to write
+        if orjson is not None:
+            buf = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            buf = json.dumps(data, indent=4).encode("utf-8")
+        with open("ip_info.json", "wb") as f:
+            f.write(buf)
 
         print("✅ IP information saved to ip_info.json\n")
     except Exception as e:
@@ -49,5 +66,10 @@ def save_to_file():
 
 
 if __name__ == "__main__":
-    get_ip_info()
-    save_to_file()
+    try:
+        data = asyncio.run(fetch_once())
+    except Exception as e:
+        print("❌ Error fetching IP details:", e)
+    else:
+        get_ip_info(data)
+        save_to_file(data)
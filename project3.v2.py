@@ -14,24 +14,47 @@ Usage examples:
   # Monitor every 60s for 10 checks and save history
   python ip_checker_advanced.py --interval 60 --count 10 --save-history ip_history.csv
 
+  # Reuse the last API response for up to 5 minutes across runs
+  python ip_checker_advanced.py --cache-file ip_cache.json --cache-ttl 300
+
   # Use a mock JSON file instead of calling the API (for testing)
   python ip_checker_advanced.py --mock sample_mock.json
 
+  # Summarize a saved history file (requires pandas)
+  python ip_checker_advanced.py --replay ip_history.csv
+
   # Display all available fields (comma-separated)
   python ip_checker_advanced.py --fields ip,version,city,region,country,country_code,latitude,longitude,timezone,isp,asn
 """
 
 import argparse
-import csv
+import asyncio
 import json
-import os
+import math
 import sys
 import time
+from contextlib import ExitStack, nullcontext
 from datetime import datetime
 
-import requests
+try:
+    # optional C-accelerated parser; its JSONDecodeError subclasses json's
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 API_URL = "https://ipapi.co/json/"
+USER_AGENT = "ip-checker/2"
+CACHE_TTL = 300  # seconds; the public IP rarely changes faster than this
+DNS_CACHE_TTL = 300  # seconds aiohttp keeps resolved addresses for the API host
+MAX_CONCURRENCY = 10  # in-flight API requests for back-to-back checks
+RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled for each further one
+RETRY_BACKOFF_MAX = 30
+HISTORY_FLUSH_EVERY = 50  # buffered history rows written per flush
+_VERSION = {True: "IPv6", False: "IPv4"}
+
+# Validators and payloads from the last live response per URL, for conditional GETs
+_etags = {}
+_last_responses = {}
 
 # Default ordered fields and friendly labels
 FIELD_LABELS = {
@@ -50,57 +73,221 @@ FIELD_LABELS = {
 }
 
 
-def fetch_live(api_url=API_URL, timeout=10):
-    r = requests.get(api_url, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+class FetchError(Exception):
+    """Network or HTTP failure while calling the live API"""
+
+    def __init__(self, error, status=None):
+        super().__init__(error)
+        self.status = status
+
+    @property
+    def transient(self):
+        # connection problems, timeouts, rate limiting and server errors are worth
+        # retrying; other HTTP errors (401/403, 404, ...) would only fail again
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+def open_session(count=1):
+    # aiohttp is imported lazily so --help and --mock runs don't pay for it
+    import aiohttp
+
+    # A single host never needs more sockets than checks we can have in flight;
+    # caching DNS answers avoids resolving the API host again on every check
+    connector = aiohttp.TCPConnector(limit=max(1, min(count, MAX_CONCURRENCY)), ttl_dns_cache=DNS_CACHE_TTL)
+    return aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT})
+
+
+async def fetch_live(session, api_url=API_URL, timeout=10):
+    import aiohttp
+
+    headers = {"If-None-Match": _etags[api_url]} if api_url in _etags else None
+    try:
+        async with session.get(api_url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+            if r.status == 304:
+                # unchanged since the last check: no body to download or parse
+                return _last_responses[api_url]
+            r.raise_for_status()
+            data = await r.json()
+            etag = r.headers.get("ETag")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise FetchError(e, getattr(e, "status", None)) from e
+
+    if etag:
+        _etags[api_url] = etag
+        _last_responses[api_url] = data
+    return data
+
+
+def _read_cache(path):
+    try:
+        with open(path, "rb") as f:
+            cache = json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        # missing or corrupt cache (bad JSON or bad encoding) is simply treated as empty
+        return {}
+    # valid JSON of the wrong shape is just as unusable
+    return cache if isinstance(cache, dict) else {}
+
+
+def cache_get(path, url, ttl=CACHE_TTL):
+    """Return the cached response for url if it is younger than ttl seconds, else None"""
+    entry = _read_cache(path).get(url)
+    # anything but a well-formed {"ts": <number>, "data": ...} entry counts as a miss
+    if not isinstance(entry, dict) or "data" not in entry:
+        return None
+    ts = entry.get("ts")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool) and time.time() - ts < ttl:
+        return entry["data"]
+    return None
+
+
+def cache_set(path, url, data):
+    cache = _read_cache(path)
+    cache[url] = {"ts": time.time(), "data": data}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+
+async def fetch_with_retry(session, args):
+    """fetch_live, retrying transient failures with exponential backoff"""
+    attempts = args.retries + 1
+    for attempt in range(attempts):
+        try:
+            return await fetch_live(session, api_url=args.api_url, timeout=args.timeout)
+        except FetchError as fe:
+            if not fe.transient or attempt == attempts - 1:
+                raise
+            await asyncio.sleep(min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+
+async def fetch_cached(session, args):
+    """fetch_live, served from --cache-file when a fresh enough entry exists"""
+    if args.cache_file:
+        data = cache_get(args.cache_file, args.api_url, args.cache_ttl)
+        if data is not None:
+            return data
+    data = await fetch_with_retry(session, args)
+    if args.cache_file:
+        cache_set(args.cache_file, args.api_url, data)
+    return data
 
 
 def load_mock(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return json_loads(f.read())
+
+
+def ip_version(ip):
+    """Classify an address string; a colon only ever appears in IPv6 notation"""
+    return _VERSION[ip is not None and ":" in ip]
+
+
+def _first(d, *keys):
+    """Value of the first key in keys that is present and truthy in d, else None"""
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return v
+    return None
 
 
 def normalize_data(data):
     """Return a normalized dictionary with keys similar to FIELD_LABELS"""
-    normalized = {}
-    ip = data.get("ip") or data.get("query") or data.get("ip_address")
-    normalized["ip"] = ip
-    normalized["version"] = "IPv6" if ip and ":" in ip else "IPv4"
+    ip = _first(data, "ip", "query", "ip_address")
     # many APIs use slightly different keys; try a few common ones
-    normalized["city"] = data.get("city")
-    normalized["region"] = data.get("region") or data.get("region_name")
-    normalized["country"] = data.get("country_name") or data.get("country")
-    normalized["country_code"] = data.get("country") or data.get("country_code")
-    # latitude/longitude sometimes nested or named lat/lon
-    normalized["latitude"] = data.get("latitude") or data.get("lat")
-    normalized["longitude"] = data.get("longitude") or data.get("lon") or data.get("lng")
-    normalized["timezone"] = data.get("timezone")
-    # org / isp keys
-    normalized["isp"] = data.get("org") or data.get("isp")
-    normalized["asn"] = data.get("asn") or data.get("as")
-    normalized["org"] = data.get("org")
-    return normalized
-
-
-def print_selected(data, fields):
-    print("\n========== Public IP Address Information ==========")
-    for f in fields:
-        label = FIELD_LABELS.get(f, f)
-        print(f"{label:20}: {data.get(f) if data.get(f) is not None else 'N/A'}")
-    print("===================================================\n")
-
-
-def append_history_csv(path, fields, data):
-    file_exists = os.path.isfile(path)
-    with open(path, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=["timestamp"] + fields)
-        if not file_exists:
-            writer.writeheader()
-        row = {"timestamp": datetime.utcnow().isoformat() + "Z"}
-        for f in fields:
+    return {
+        "ip": ip,
+        "version": ip_version(ip),
+        "city": data.get("city"),
+        "region": _first(data, "region", "region_name"),
+        "country": _first(data, "country_name", "country"),
+        "country_code": _first(data, "country", "country_code"),
+        # latitude/longitude sometimes named lat/lon
+        "latitude": _first(data, "latitude", "lat"),
+        "longitude": _first(data, "longitude", "lon", "lng"),
+        "timezone": data.get("timezone"),
+        # org / isp keys
+        "isp": _first(data, "org", "isp"),
+        "asn": _first(data, "asn", "as"),
+        "org": data.get("org"),
+    }
+
+
+def build_label_cache(fields):
+    """Pre-format the padded label for each field once per run: [(label, field), ...]"""
+    return [(f"{FIELD_LABELS.get(f, f):20}", f) for f in fields]
+
+
+def print_selected(data, label_cache):
+    # build the whole block and emit it with a single write
+    get = data.get
+    lines = ["", "========== Public IP Address Information =========="]
+    lines.extend(f"{label}: {'N/A' if (v := get(f)) is None else v}" for label, f in label_cache)
+    lines.append("===================================================")
+    lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def utc_timestamp():
+    """ISO-8601 UTC timestamp with microseconds, built without a datetime object"""
+    now = time.time()
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}Z"
+
+
+class HistoryWriter:
+    """CSV history log kept open for the whole run; rows are buffered and written every flush_every rows"""
+
+    def __init__(self, path, fields, flush_every=HISTORY_FLUSH_EVERY):
+        self.path = path
+        self.fields = fields
+        self.flush_every = flush_every
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        import csv
+
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=["timestamp"] + self.fields)
+        return self
+
+    def write(self, data):
+        """Queue a row; returns True if it (and any earlier buffered rows) reached the file"""
+        row = {"timestamp": utc_timestamp()}
+        for f in self.fields:
             row[f] = data.get(f)
-        writer.writerow(row)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        if not self._buffer:
+            return
+        # the header goes out with the first rows, so a run that logs nothing
+        # leaves no header-only file behind; append mode starts at the end, so
+        # an empty (new or truncated) file is the only one that needs it
+        if self.rows_written == 0 and self._file.tell() == 0:
+            self._writer.writeheader()
+        self._writer.writerows(self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer.clear()
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc, tb):
+        # also reached on KeyboardInterrupt, so buffered rows are never lost
+        self.flush()
+        self._file.close()
+
+
+def non_negative_int(value):
+    n = int(value)
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {n}")
+    return n
 
 
 def parse_args():
@@ -112,74 +299,226 @@ def parse_args():
                         default="ip,version,city,region,country,isp,asn")
     parser.add_argument("--interval", type=int, default=0,
                         help="Interval in seconds to re-run checks (0 = run once)")
+    parser.add_argument("--min-interval", type=float, default=0,
+                        help="Minimum seconds between live API calls, whatever --interval is (default 0)")
     parser.add_argument("--count", type=int, default=1,
                         help="How many times to run (default 1). Use with --interval for periodic runs.")
     parser.add_argument("--save-history", metavar="FILE",
                         help="Append history to CSV file")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Summarize a history CSV written by --save-history instead of running checks (needs pandas)")
     parser.add_argument("--api-url", default=API_URL, help="API endpoint to use")
     parser.add_argument("--timeout", type=int, default=10, help="HTTP request timeout seconds")
+    parser.add_argument("--retries", type=non_negative_int, default=4,
+                        help="Extra attempts per live API call on transient errors (default 4; 0 = no retry)")
+    parser.add_argument("--cache-file", metavar="FILE",
+                        help="Cache API responses in this JSON file and reuse them while fresh")
+    parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL,
+                        help=f"Seconds a cached API response stays valid (default {CACHE_TTL})")
     parser.add_argument("--no-print-time", action="store_true", help="Don't print the timestamp before each check")
-    return parser.parse_args()
+    args = parser.parse_args()
+    # split once at parse time; callers use args.fields_list instead of re-splitting
+    args.fields_list = [f.strip() for f in args.fields.split(",") if f.strip()]
+    return args
+
+
+def replay_history(path):
+    """Summarize a --save-history CSV, loading and classifying it in vectorized passes"""
+    # pandas/numpy are only needed for --replay, so they are optional and imported here
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        print("❌ --replay requires pandas and numpy (pip install pandas)")
+        return
+
+    read_errors = (pd.errors.EmptyDataError, pd.errors.ParserError)
+    try:
+        import pyarrow
+    except ImportError:
+        # pyarrow is optional too; fall back to pandas' own C parser
+        engine = "c"
+    else:
+        engine = "pyarrow"
+        read_errors += (pyarrow.ArrowInvalid,)
+
+    try:
+        df = pd.read_csv(path, engine=engine)
+    except FileNotFoundError as fnfe:
+        print("❌ History file not found:", fnfe)
+        return
+    except read_errors as e:
+        print("❌ History file is empty or not valid CSV:", e)
+        return
+    if "ip" not in df.columns:
+        print(f"❌ History file has no 'ip' column: {path}")
+        return
+
+    ips = df["ip"].astype("string")
+    is_v6 = ips.str.contains(":", regex=False, na=False).to_numpy()
+    df["version"] = np.where(is_v6, "IPv6", "IPv4")
+    changes = int((ips != ips.shift()).iloc[1:].fillna(True).sum())
+
+    lines = ["", "=============== IP History Summary ================"]
+    lines.append(f"{'Checks':20}: {len(df)}")
+    if "timestamp" in df.columns and len(df):
+        lines.append(f"{'First check':20}: {df['timestamp'].iloc[0]}")
+        lines.append(f"{'Last check':20}: {df['timestamp'].iloc[-1]}")
+    lines.append(f"{'Distinct IPs':20}: {ips.nunique()}")
+    lines.append(f"{'IP changes':20}: {changes}")
+    for version, n in df["version"].value_counts().sort_index().items():
+        lines.append(f"{version + ' checks':20}: {n}")
+    lines.append("===================================================")
+    lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def apply_manual_ip(data, manual_ip):
+    """Override the ip field (and recalc version) if a manual IP was provided"""
+    if not manual_ip:
+        return data
+    return {**data, "ip": manual_ip, "version": ip_version(manual_ip)}
+
+
+def prepare_mock(args):
+    """Load and normalize the mock file once per run. Returns None if it can't be used."""
+    try:
+        data_raw = load_mock(args.mock)
+        if not isinstance(data_raw, dict):
+            print(f"❌ Mock file must contain a JSON object, got {type(data_raw).__name__}")
+            return None
+        return apply_manual_ip(normalize_data(data_raw), args.manual_ip)
+    except FileNotFoundError as fnfe:
+        print("❌ Mock file not found:", fnfe)
+    except json.JSONDecodeError as jde:
+        print("❌ Mock file returned invalid JSON:", jde)
+    except Exception as e:
+        print("❌ Unexpected error:", e)
+    return None
+
+
+async def run_check(session, args, label_cache, history, run_index, mock_data=None):
+    """Run a single check. Returns False if the remaining checks should be abandoned."""
+    try:
+        if not args.no_print_time:
+            print(f"[{datetime.now().isoformat(sep=' ', timespec='seconds')}] Running check ({run_index + 1}/{args.count})")
+
+        # get data from mock (prepared once, never mutated) or live
+        if mock_data is not None:
+            data = mock_data
+        else:
+            data = apply_manual_ip(normalize_data(await fetch_cached(session, args)), args.manual_ip)
+
+        # print selected fields
+        print_selected(data, label_cache)
+
+        # save history if requested
+        if history:
+            if history.write(data):
+                print(f"✅ Appended to history: {args.save_history}")
+            else:
+                print(f"✅ Buffered for history: {args.save_history}")
+
+    except FetchError as fe:
+        print("❌ Network/API error:", fe)
+    except json.JSONDecodeError as jde:
+        print("❌ API returned invalid JSON:", jde)
+        return False
+    except Exception as e:
+        print("❌ Unexpected error:", e)
+    return True
+
+
+def check_period(args):
+    """Seconds between check starts; 0 means back to back"""
+    # --min-interval only rate-limits calls to the remote API; mock runs are never throttled
+    return args.interval if args.mock else max(args.interval, args.min_interval)
+
+
+async def run_all(args, label_cache, history, mock_data=None):
+    # One session for the whole run so keep-alive connections (and the TLS
+    # handshake) are reused between checks; default headers are set once here.
+    # Mock runs never touch the network and get no session at all.
+    async with (nullcontext() if args.mock else open_session(args.count)) as session:
+        period = check_period(args)
+        if period == 0 and not args.mock and args.count > 1:
+            # Back-to-back live checks: let the requests overlap, but keep at
+            # most MAX_CONCURRENCY in flight to stay polite to the public API
+            sem = asyncio.Semaphore(MAX_CONCURRENCY)
+            # set by a check that asks to abandon the run; queued checks then skip
+            abandoned = asyncio.Event()
+
+            async def bounded_check(run_index):
+                async with sem:
+                    if abandoned.is_set():
+                        return False
+                    if not await run_check(session, args, label_cache, history, run_index):
+                        abandoned.set()
+                        return False
+                    return True
+
+            await asyncio.gather(*[bounded_check(i) for i in range(args.count)])
+            return
+
+        # checks are scheduled on fixed deadlines from the start, so the time
+        # spent on each check does not push the following ones back
+        next_deadline = time.monotonic()
+        run_count = 0
+        while run_count < args.count:
+            if not await run_check(session, args, label_cache, history, run_count, mock_data):
+                break
+
+            run_count += 1
+            if run_count >= args.count:
+                break
+
+            # Sleep only if we will run again
+            if period > 0:
+                next_deadline += period
+                now = time.monotonic()
+                if next_deadline < now:
+                    # a check overran (e.g. retries during an outage): skip the missed
+                    # slots rather than firing catch-up calls back to back
+                    next_deadline += math.ceil((now - next_deadline) / period) * period
+                await asyncio.sleep(next_deadline - now)
 
 
 def main():
     args = parse_args()
 
-    # Prepare fields list
-    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+    if args.replay:
+        replay_history(args.replay)
+        return
+
+    fields = args.fields_list
     if not fields:
         print("No fields specified. Exiting.")
         sys.exit(1)
-
-    run_count = 0
-    while run_count < args.count:
-        try:
-            if not args.no_print_time:
-                print(f"[{datetime.now().isoformat(sep=' ', timespec='seconds')}] Running check ({run_count + 1}/{args.count})")
-
-            # get data from mock or live
-            if args.mock:
-                data_raw = load_mock(args.mock)
-            else:
-                data_raw = fetch_live(api_url=args.api_url, timeout=args.timeout)
-
-            data = normalize_data(data_raw)
-
-            # If manual-ip provided, override the ip field and recalc version
-            if args.manual_ip:
-                data["ip"] = args.manual_ip
-                data["version"] = "IPv6" if ":" in args.manual_ip else "IPv4"
-
-            # print selected fields
-            print_selected(data, fields)
-
-            # save history if requested
-            if args.save_history:
-                append_history_csv(args.save_history, fields, data)
-                print(f"✅ Appended to history: {args.save_history}")
-
-        except requests.RequestException as re:
-            print("❌ Network/API error:", re)
-        except FileNotFoundError as fnfe:
-            print("❌ Mock file not found:", fnfe)
-            break
-        except json.JSONDecodeError as jde:
-            print("❌ Mock file or API returned invalid JSON:", jde)
-            break
-        except Exception as e:
-            print("❌ Unexpected error:", e)
-
-        run_count += 1
-        if run_count >= args.count:
-            break
-
-        # Sleep only if we will run again
-        if args.interval > 0:
-            time.sleep(args.interval)
-        else:
-            # no interval but more runs requested -> avoid busy loop
-            time.sleep(1)
-
+    label_cache = build_label_cache(fields)
+
+    # load the mock before opening the history file, so a bad mock leaves no file behind
+    mock_data = None
+    if args.mock:
+        mock_data = prepare_mock(args)
+        if mock_data is None:
+            print("Done.")
+            return
+
+    # periodic runs write every row as it comes in, so a killed monitor loses
+    # nothing; only back-to-back runs batch their rows
+    flush_every = 1 if check_period(args) > 0 else HISTORY_FLUSH_EVERY
+    with ExitStack() as stack:
+        history = None
+        if args.save_history:
+            try:
+                history = stack.enter_context(HistoryWriter(args.save_history, fields, flush_every))
+            except OSError as oe:
+                # the checks still run; they just aren't logged
+                print("❌ Could not open history file:", oe)
+        asyncio.run(run_all(args, label_cache, history, mock_data))
+
+    if history and flush_every > 1 and history.rows_written:
+        print(f"✅ Buffered rows written to history: {args.save_history}")
     print("Done.")
 
 